@@ -4,7 +4,7 @@ from typing import Annotated
 from contextlib import contextmanager
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
@@ -14,6 +14,7 @@ from app.core import security
 from app.core.config import settings
 from app.core.db import engine
 from app.models import TokenPayload, User
+from app.services.llm_service import LLMService
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -62,4 +63,14 @@ def get_current_active_superuser(current_user: CurrentUser) -> User:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have enough privileges"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+def get_llm_service(request: Request) -> LLMService:
+    """Dependency to provide the LLM service instance built at startup."""
+    if not settings.GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API key is not configured.")
+    return request.app.state.llm_service
+
+
+LLMServiceDep = Annotated[LLMService, Depends(get_llm_service)]
@@ -1,24 +1,17 @@
 # api/routes/advisory.py
 
-import os
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
-from app.api.deps import CurrentUser
-from app.services.llm_service import LLMService
-from app.core.config import settings 
+from fastapi import APIRouter, HTTPException, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from app.api.deps import CurrentUser, LLMServiceDep
+from app.utils import sse_events
 
 router = APIRouter(tags=["advisory"])
 
-def get_llm_service() -> LLMService:
-    """Dependency to provide the LLM service instance."""
-    if not settings.GEMINI_API_KEY:
-        raise HTTPException(status_code=500, detail="Gemini API key is not configured.")
-    return LLMService(api_key=settings.GEMINI_API_KEY)
-
 @router.get("/text-advisory")
 async def get_text_advisory(
     user_query: Annotated[str, Query(..., description="The user's crop-related query.")],
-    llm_service: Annotated[LLMService, Depends(get_llm_service)],
+    llm_service: LLMServiceDep,
     current_user: CurrentUser, # Assuming authentication is required
 ):
     """
@@ -34,38 +27,50 @@ async def get_text_advisory(
         
     return advisory_response
 
+@router.get("/text-advisory/stream")
+async def stream_text_advisory(
+    user_query: Annotated[str, Query(..., description="The user's crop-related query.")],
+    llm_service: LLMServiceDep,
+    current_user: CurrentUser, # Assuming authentication is required
+):
+    """
+    Stream text-based crop and soil advisory as Server-Sent Events.
+    """
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Query string cannot be empty.")
+
+    return StreamingResponse(sse_events(llm_service.stream_advisory(user_query)), media_type="text/event-stream")
+
 @router.post("/image-advisory")
 async def get_image_advisory(
     file: Annotated[UploadFile, File(..., description="An image of the user's screen.")],
     user_query: Annotated[str, Query(..., description="The user's question about the app navigation.")],
-    llm_service: Annotated[LLMService, Depends(get_llm_service)],
+    llm_service: LLMServiceDep,
     current_user: CurrentUser, # Assuming authentication is required
 ):
     """
     Get image-based app navigation guidance.
     """
-    # Create the directory for temporary images if it doesn't exist
-    temp_dir = "temp_images"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    # Save the uploaded image to a temporary location
-    file_path = os.path.join(temp_dir, file.filename)
-    try:
-        with open(file_path, "wb") as buffer:
-            while content := await file.read(1024):
-                buffer.write(content)
+    image_bytes = await file.read()
+    advisory_response = await llm_service.get_image_advisory(image_bytes, user_query)
 
-        advisory_response = await llm_service.get_image_advisory(file_path, user_query)
+    if "error" in advisory_response:
+        raise HTTPException(status_code=500, detail=f"Failed to process image: {advisory_response['error']}")
 
-        # Clean up the temporary file
-        os.remove(file_path)
+    return advisory_response
 
-        if "error" in advisory_response:
-            raise HTTPException(status_code=500, detail=advisory_response["error"])
-        
-        return advisory_response
-    except Exception as e:
-        # Ensure file is removed even if an error occurs
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Failed to process image: {e}")
\ No newline at end of file
+@router.post("/image-advisory/stream")
+async def stream_image_advisory(
+    file: Annotated[UploadFile, File(..., description="An image of the user's screen.")],
+    user_query: Annotated[str, Query(..., description="The user's question about the app navigation.")],
+    llm_service: LLMServiceDep,
+    current_user: CurrentUser, # Assuming authentication is required
+):
+    """
+    Stream image-based app navigation guidance as Server-Sent Events.
+    """
+    image_bytes = await file.read()
+    return StreamingResponse(
+        sse_events(llm_service.stream_image_advisory(image_bytes, user_query)),
+        media_type="text/event-stream",
+    )
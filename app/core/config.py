@@ -35,6 +35,18 @@ class Settings(BaseSettings):
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
     GEMINI_API_KEY: str
+    # Max in-flight Gemini calls per worker; size to the API quota / workers
+    LLM_MAX_CONCURRENCY: int = 20
+    LLM_CACHE_MAXSIZE: int = 10_000
+    LLM_CACHE_TTL: int = 3600  # seconds
+    LLM_DISK_CACHE_DIR: str | None = None
+    LLM_DISK_CACHE_TTL: int = 86400  # seconds
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_TTL: int = 86400  # seconds
+    SEMANTIC_CACHE_INDEX_PATH: str | None = None
+    # anyio defaults to 40 threads; requests mostly wait on Gemini and the DB
+    THREADPOOL_SIZE: int = 100
     FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
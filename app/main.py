@@ -1,10 +1,17 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
 import sentry_sdk
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
 from app.core.config import settings
+from app.services.cache import llm_cache, semantic_cache
+from app.services.llm_service import LLMService
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,8 +21,36 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Each uvicorn worker is a single event loop, so deploy with one worker per
+    core (`uvicorn app.main:app --workers $(nproc)`). Within a worker, sync
+    dependencies run on anyio's threadpool and `asyncio.to_thread` work on the
+    loop's default executor; both are sized by THREADPOOL_SIZE, since the
+    work they carry is mostly I/O-bound.
+    """
+    to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.THREADPOOL_SIZE)
+    )
+    # One client per worker, so its HTTP connection pool is reused across requests
+    app.state.llm_service = LLMService(
+        api_key=settings.GEMINI_API_KEY, max_concurrency=settings.LLM_MAX_CONCURRENCY
+    )
+    await llm_cache.open()
+    if settings.SEMANTIC_CACHE_ENABLED:
+        await semantic_cache.load()
+    yield
+    await semantic_cache.save()
+    await llm_cache.close()
+    await app.state.llm_service.aclose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
 )
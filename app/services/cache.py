@@ -0,0 +1,246 @@
+# app/services/cache.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import diskcache
+from blake3 import blake3
+from cachetools import TTLCache
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(data: bytes) -> str:
+    """
+    BLAKE3 hex digest of raw content (e.g. an uploaded image). The SIMD kernel
+    runs without the GIL and spreads multi-MB inputs across cores.
+    """
+    return blake3(data, max_threads=blake3.AUTO).hexdigest()
+
+
+class LLMCache:
+    """
+    Cache for LLM responses keyed by a hash of the request: an in-memory TTL/LRU
+    tier, optionally backed by an on-disk tier that survives worker restarts
+    and is shared by all workers on the host. The disk tier is only used once
+    `open()` has run.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        ttl: int = 3600,
+        disk_dir: Optional[str] = None,
+        disk_ttl: int = 86400,
+        disk_size_limit: int = 1 << 30,
+    ):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = asyncio.Lock()
+        self._disk: Optional[diskcache.Cache] = None
+        self._disk_dir = disk_dir
+        self._disk_ttl = disk_ttl
+        self._disk_size_limit = disk_size_limit
+
+    async def open(self) -> None:
+        """Opens the on-disk tier, if configured. Call once at startup."""
+        if self._disk_dir and self._disk is None:
+            self._disk = await asyncio.to_thread(
+                diskcache.Cache, self._disk_dir, size_limit=self._disk_size_limit
+            )
+
+    async def close(self) -> None:
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.close)
+            self._disk = None
+
+    @staticmethod
+    def cache_key(model: str, messages: Any, temperature: Optional[float]) -> str:
+        """
+        Builds a deterministic key from everything that influences the LLM output.
+        """
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        async with self._lock:
+            value = self._cache.get(key)
+        if value is not None or self._disk is None:
+            return value
+
+        value = await asyncio.to_thread(self._disk.get, key)
+        if value is not None:
+            async with self._lock:
+                self._cache[key] = value
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        async with self._lock:
+            self._cache[key] = value
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, value, expire=self._disk_ttl)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache over query embeddings, so near-duplicate queries
+    ("when to sow wheat" / "best time for wheat sowing") reuse one response.
+
+    sentence-transformers and faiss are optional; without them, or until
+    `load()` has run, the cache stays disabled and every lookup misses.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        threshold: float = 0.92,
+        maxsize: int = 10_000,
+        ttl: int = 86400,
+        index_path: Optional[str] = None,
+    ):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.index_path = index_path
+        self._faiss: Any = None
+        self._np: Any = None
+        self._model: Any = None
+        self._index: Any = None
+        # Parallel to the index rows: response text and creation time
+        self._responses: list[str] = []
+        self._created: list[float] = []
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    async def load(self) -> None:
+        """Loads the embedding model and any persisted entries. Call once at startup."""
+        try:
+            import faiss
+            import numpy as np
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.warning("Semantic cache disabled: sentence-transformers/faiss not installed.")
+            return
+
+        self._faiss, self._np = faiss, np
+        self._model = await asyncio.to_thread(SentenceTransformer, self.model_name)
+        # Embeddings are normalized, so inner product == cosine similarity.
+        self._index = faiss.IndexFlatIP(self._model.get_sentence_embedding_dimension())
+
+        if self.index_path and Path(self.index_path).exists():
+            await asyncio.to_thread(self._restore)
+            logger.info(f"Loaded {len(self._responses)} semantic cache entries from {self.index_path}")
+
+    async def save(self) -> None:
+        """Persists the entries to `index_path`, if configured."""
+        if not self.ready or not self.index_path:
+            return
+        async with self._lock:
+            embeddings = self._embeddings()
+            responses, created = list(self._responses), list(self._created)
+        await asyncio.to_thread(self._write, embeddings, responses, created)
+
+    async def embed(self, text: str) -> Any:
+        return await asyncio.to_thread(self._model.encode, text, normalize_embeddings=True)
+
+    async def get(self, embedding: Any) -> Optional[str]:
+        async with self._lock:
+            if self._index.ntotal == 0:
+                return None
+            scores, ids = self._index.search(embedding[None], 1)
+            row = ids[0, 0]
+            if scores[0, 0] > self.threshold and self._created[row] > time.time() - self.ttl:
+                return self._responses[row]
+        return None
+
+    async def set(self, embedding: Any, value: str) -> None:
+        async with self._lock:
+            if self._index.ntotal >= self.maxsize:
+                # Drop expired entries, then the oldest, leaving room to grow again
+                await asyncio.to_thread(
+                    self._rebuild, self._embeddings(), self._responses, self._created, self.maxsize * 9 // 10
+                )
+            self._index.add(embedding[None])
+            self._responses.append(value)
+            self._created.append(time.time())
+
+    def _embeddings(self) -> Any:
+        return self._index.reconstruct_n(0, self._index.ntotal)
+
+    def _rebuild(self, embeddings: Any, responses: list[str], created: list[float], limit: int) -> None:
+        """Replaces the index with the newest `limit` unexpired entries."""
+        cutoff = time.time() - self.ttl
+        keep = [i for i, created_at in enumerate(created) if created_at > cutoff]
+        if len(keep) > limit:
+            keep = keep[len(keep) - limit:]
+        index = self._faiss.IndexFlatIP(self._index.d)
+        if keep:
+            index.add(embeddings[keep])
+        self._index = index
+        self._responses = [responses[i] for i in keep]
+        self._created = [created[i] for i in keep]
+
+    def _restore(self) -> None:
+        try:
+            with self._np.load(self.index_path) as data:
+                embeddings, created = data["embeddings"], data["created"]
+                responses = json.loads(data["responses"].tobytes().decode("utf-8"))
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable semantic cache {self.index_path}: {e}")
+            return
+        if not len(embeddings) == len(responses) == len(created) or embeddings.shape[1:] != (self._index.d,):
+            logger.warning(f"Ignoring inconsistent semantic cache {self.index_path}")
+            return
+        self._rebuild(embeddings, responses, created.tolist(), self.maxsize)
+
+    def _write(self, embeddings: Any, responses: list[str], created: list[float]) -> None:
+        # One file, swapped in atomically, so concurrent workers saving on
+        # shutdown can never leave an index paired with another's responses.
+        # Responses go in as one UTF-8 JSON blob; a numpy str array would pad
+        # every row to the longest response at 4 bytes per character.
+        blob = json.dumps(responses, ensure_ascii=False).encode("utf-8")
+        path = Path(self.index_path)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._np.savez_compressed(
+                    f,
+                    embeddings=embeddings,
+                    responses=self._np.frombuffer(blob, dtype=self._np.uint8),
+                    created=self._np.array(created, dtype=float),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+# Process-wide instances, shared by every LLMService in the worker.
+llm_cache = LLMCache(
+    maxsize=settings.LLM_CACHE_MAXSIZE,
+    ttl=settings.LLM_CACHE_TTL,
+    disk_dir=settings.LLM_DISK_CACHE_DIR,
+    disk_ttl=settings.LLM_DISK_CACHE_TTL,
+)
+semantic_cache = SemanticCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    maxsize=settings.LLM_CACHE_MAXSIZE,
+    ttl=settings.SEMANTIC_CACHE_TTL,
+    index_path=settings.SEMANTIC_CACHE_INDEX_PATH,
+)
@@ -1,26 +1,74 @@
 # app/services/llm_service.py
 
-import json
-from typing import Dict, Any, List, Optional
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Tuple
 import logging
-from pathlib import Path
-import base64
+from io import BytesIO
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage
-from langchain.prompts import PromptTemplate
+from google import genai
+from google.genai import types
+from PIL import Image, ImageOps
+
+from app.services.cache import LLMCache, SemanticCache, content_digest, llm_cache, semantic_cache
 
 logger = logging.getLogger(__name__)
 
+# Languages requested often enough to pre-render the disease detection prompt for
+DISEASE_DETECTION_LANGUAGES = (
+    "English", "Hindi", "Marathi", "Telugu", "Tamil", "Bengali", "Kannada", "Gujarati",
+)
+
+
+def shrink_image(image_bytes: bytes, max_side: int = 1024) -> Tuple[bytes, str]:
+    """
+    Downscales an uploaded photo to `max_side` px on its longest edge and
+    re-encodes it as WebP. Gemini downsamples large images server-side anyway,
+    so this only cuts upload size and latency. Returns the bytes and mime type;
+    input PIL cannot decode is passed through unchanged.
+    """
+    try:
+        img = Image.open(BytesIO(image_bytes))
+        img.draft("RGB", (max_side, max_side))  # cheap JPEG DCT-domain downscale
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, "WEBP", quality=80)
+    except Image.DecompressionBombError as e:
+        # Not an OSError/ValueError; too large to decode safely, so leave it as is
+        logger.warning(f"Image too large to re-encode, sending original: {e}")
+        return image_bytes, "image/png"
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not re-encode image, sending original: {e}")
+        return image_bytes, "image/png"
+    return buffer.getvalue(), "image/webp"
+
+
 class LLMService:
     """Service for handling AI advisory and image-based assistance using Gemini."""
 
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
-        self.llm = ChatGoogleGenerativeAI(
-            model=model,
-            google_api_key=api_key,
-            temperature=0.2,  
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gemini-2.5-flash",
+        cache: Optional[LLMCache] = None,
+        semantic: Optional[SemanticCache] = None,
+        max_concurrency: int = 20,
+    ):
+        # HTTP/2 multiplexes concurrent calls over one connection per host
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(async_client_args={"http2": True}),
         )
+        self.model = model
+        self.config = types.GenerateContentConfig(temperature=0.2)
+        self.cache = cache or llm_cache
+        self.semantic = semantic or semantic_cache
+        # Bounds outbound Gemini calls so bursts queue here instead of hitting 429s
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Cache key -> task of the Gemini call currently answering it
+        self._inflight: Dict[str, asyncio.Future] = {}
         # You can keep existing prompts or define new ones as needed.
         self.advisory_prompt = (
             "You are a smart crop advisory system for small and marginal farmers in India. "
@@ -39,6 +87,10 @@ class LLMService:
             "Query: {query}"
         )
 
+        # Split once so per-request prompts are plain concatenation, not str.format
+        self._adv_prefix, self._adv_suffix = self.advisory_prompt.split("{query}")
+        self._img_prefix, self._img_suffix = self.image_advisory_prompt.split("{query}")
+
         # New prompt for crop disease detection
         self.disease_detection_prompt = (
             "You are a crop disease expert. A user has uploaded an image of a plant. "
@@ -55,77 +107,184 @@ class LLMService:
             "3. **उपचार**: नीम तेल और पानी का घोल मिलाकर पौधों पर स्प्रे करें।"
         )
 
+        self._dd_prompts = {
+            lang: self.disease_detection_prompt.format(language=lang)
+            for lang in DISEASE_DETECTION_LANGUAGES
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aio.aclose()
+
+    async def _invoke(self, contents: Any) -> str:
+        async with self._semaphore:
+            response = await self.client.aio.models.generate_content(
+                model=self.model, contents=contents, config=self.config
+            )
+        text = (response.text or "").strip()
+        if not text:
+            # Blocked or empty replies must surface as errors, never be cached
+            raise ValueError("Gemini returned an empty response.")
+        return text
+
+    async def _coalesce(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        """
+        Runs `call` at most once per key at a time. Concurrent identical requests
+        await the in-flight result instead of issuing a duplicate Gemini call.
+        The call runs in its own task, so one caller being cancelled (e.g. a
+        client disconnect) does not cancel it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark as retrieved in case every caller went away
+
+    async def _image_request(
+        self, full_prompt: str, image_bytes: bytes
+    ) -> Tuple[str, Callable[[], Awaitable[List[Any]]]]:
+        """
+        Returns the cache key for a prompt + image pair, and a builder for the
+        Gemini request contents that is only run on a cache miss.
+        """
+        digest = await asyncio.to_thread(content_digest, image_bytes)
+        cache_key = self.cache.cache_key(self.model, [full_prompt, digest], self.config.temperature)
+
+        async def build_content() -> List[Any]:
+            data, mime_type = await asyncio.to_thread(shrink_image, image_bytes)
+            # Raw bytes go straight into the request's inline_data, no base64 copy.
+            return [full_prompt, types.Part.from_bytes(data=data, mime_type=mime_type)]
+
+        return cache_key, build_content
+
+    def _disease_prompt(self, language: Optional[str]) -> str:
+        return self._dd_prompts.get(language) or self.disease_detection_prompt.format(language=language)
+
+    async def _generate(self, cache_key: str, build_content: Callable[[], Awaitable[Any]]) -> str:
+        """
+        Returns the cached response for `cache_key`, or calls Gemini and caches it.
+        """
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        async def call() -> str:
+            text = await self._invoke(await build_content())
+            await self.cache.set(cache_key, text)
+            return text
+
+        return await self._coalesce(cache_key, call)
+
+    async def _stream(self, cache_key: str, build_content: Callable[[], Awaitable[Any]]) -> AsyncIterator[str]:
+        """
+        Yields response text as Gemini generates it and caches the full text at the end.
+        """
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts: List[str] = []
+        contents = await build_content()
+        async with self._semaphore:
+            stream = await self.client.aio.models.generate_content_stream(
+                model=self.model, contents=contents, config=self.config
+            )
+            async for chunk in stream:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        text = "".join(parts).strip()
+        if not text:
+            raise ValueError("Gemini returned an empty response.")
+        await self.cache.set(cache_key, text)
+
     async def get_advisory(self, user_query: str) -> Dict[str, Any]:
         """
         Provides text-based crop advisory using the LLM.
         """
         try:
-            full_prompt = self.advisory_prompt.format(query=user_query)
-            message = HumanMessage(content=full_prompt)
-            response = await self.llm.ainvoke([message])
-            return {"advisory": response.content.strip()}
+            full_prompt = f"{self._adv_prefix}{user_query}{self._adv_suffix}"
+            cache_key = self.cache.cache_key(self.model, full_prompt, self.config.temperature)
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return {"advisory": cached}
+
+            embedding = None
+            if self.semantic.ready:
+                embedding = await self.semantic.embed(user_query)
+                cached = await self.semantic.get(embedding)
+                if cached is not None:
+                    await self.cache.set(cache_key, cached)
+                    return {"advisory": cached}
+
+            async def generate() -> str:
+                advisory = await self._invoke(full_prompt)
+                await self.cache.set(cache_key, advisory)
+                if embedding is not None:
+                    await self.semantic.set(embedding, advisory)
+                return advisory
+
+            return {"advisory": await self._coalesce(cache_key, generate)}
         except Exception as e:
             logger.error(f"Text advisory failed for query '{user_query}': {e}")
             return {"error": str(e)}
 
-    async def get_image_advisory(self, image_path: str, user_query: str) -> Dict[str, Any]:
+    async def stream_advisory(self, user_query: str) -> AsyncIterator[str]:
+        """
+        Streams text-based crop advisory as it is generated.
+        """
+        full_prompt = f"{self._adv_prefix}{user_query}{self._adv_suffix}"
+        cache_key = self.cache.cache_key(self.model, full_prompt, self.config.temperature)
+
+        async def build_content() -> str:
+            return full_prompt
+
+        async for text in self._stream(cache_key, build_content):
+            yield text
+
+    async def get_image_advisory(self, image_bytes: bytes, user_query: str) -> Dict[str, Any]:
         """
         Provides guidance on app navigation or features based on an image and text query.
         """
         try:
-            path = Path(image_path)
-            if not path.exists():
-                raise FileNotFoundError(f"Image not found: {image_path}")
-            
-            with open(image_path, "rb") as f:
-                image_bytes = f.read()
-            encoded_image = base64.b64encode(image_bytes).decode("utf-8")
-            
-            full_prompt = self.image_advisory_prompt.format(query=user_query)
-            
-            message_content = [
-                {
-                    "type": "text",
-                    "text": full_prompt,
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{encoded_image}"},
-                },
-            ]
-
-            message = HumanMessage(content=message_content)
-            response = await self.llm.ainvoke([message])
-            return {"advisory": response.content.strip()}
+            full_prompt = f"{self._img_prefix}{user_query}{self._img_suffix}"
+            cache_key, build_content = await self._image_request(full_prompt, image_bytes)
+            return {"advisory": await self._generate(cache_key, build_content)}
         except Exception as e:
             logger.error(f"Image-based advisory failed for query '{user_query}': {e}")
             return {"error": str(e)}
 
+    async def stream_image_advisory(self, image_bytes: bytes, user_query: str) -> AsyncIterator[str]:
+        """
+        Streams image-based app navigation guidance as it is generated.
+        """
+        full_prompt = f"{self._img_prefix}{user_query}{self._img_suffix}"
+        cache_key, build_content = await self._image_request(full_prompt, image_bytes)
+        async for text in self._stream(cache_key, build_content):
+            yield text
+
     # New method for disease detection
-    async def detect_disease(self, image_path: str, language: Optional[str] = "English") -> Dict[str, Any]:
+    async def detect_disease(self, image_bytes: bytes, language: Optional[str] = "English") -> Dict[str, Any]:
         """
         Detects crop diseases from an image and provides diagnosis and treatment in the specified language.
         """
         try:
-            path = Path(image_path)
-            if not path.exists():
-                raise FileNotFoundError(f"Image not found: {image_path}")
-
-            with open(image_path, "rb") as f:
-                image_bytes = f.read()
-            encoded_image = base64.b64encode(image_bytes).decode("utf-8")
-            
-            # Format the prompt with the requested language
-            full_prompt = self.disease_detection_prompt.format(language=language)
-
-            message_content = [
-                {"type": "text", "text": full_prompt},
-                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{encoded_image}"}},
-            ]
-
-            message = HumanMessage(content=message_content)
-            response = await self.llm.ainvoke([message])
-            return {"analysis": response.content.strip()}
+            cache_key, build_content = await self._image_request(self._disease_prompt(language), image_bytes)
+            return {"analysis": await self._generate(cache_key, build_content)}
         except Exception as e:
-            logger.error(f"Disease detection failed for image {image_path}: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            logger.error(f"Disease detection failed for language '{language}': {e}")
+            return {"error": str(e)}
+
+    async def stream_disease_detection(self, image_bytes: bytes, language: Optional[str] = "English") -> AsyncIterator[str]:
+        """
+        Streams crop disease diagnosis and treatment as it is generated.
+        """
+        cache_key, build_content = await self._image_request(self._disease_prompt(language), image_bytes)
+        async for text in self._stream(cache_key, build_content):
+            yield text
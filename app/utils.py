@@ -1,4 +1,5 @@
 import logging
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -120,4 +121,25 @@ def verify_password_reset_token(token: str) -> str | None:
         )
         return str(decoded_token["sub"])
     except InvalidTokenError:
-        return None
\ No newline at end of file
+        return None
+
+
+def _sse_frame(data: str, event: str | None = None) -> str:
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in data.split("\n")]
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_events(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Wraps a stream of text chunks as Server-Sent Events, ending with a `done`
+    event, or an `error` event if the stream fails part-way.
+    """
+    try:
+        async for chunk in chunks:
+            yield _sse_frame(chunk)
+    except Exception as e:
+        logger.error(f"Streaming response failed: {e}")
+        yield _sse_frame(str(e), event="error")
+        return
+    yield _sse_frame("", event="done")